@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+
+
+log = logging.getLogger(__name__)
+
+
+MAX_MESSAGE_SIZE = 4096
+
+
+def chain(*commits):
+    def commit():
+        for c in commits:
+            c()
+
+    return commit
+
+
+class ControlServer:
+    """Receives parameter updates on a unix datagram socket.
+
+    Messages are JSON objects of the form ``{"target": name, "params": {...}}``.
+    The handler registered for ``target`` is called on the listener thread with
+    ``params`` as keyword arguments and must return a commit callable. All
+    expensive work (rebuilding windows, lookup tables, ...) happens inside the
+    handler; the commit only swaps the prepared values in. Commits are queued
+    and executed by ``apply_pending``, which the root node of the pipeline
+    calls between frames.
+    """
+
+    def __init__(self, socket_path):
+        self._socket_path = socket_path
+        self._handlers = {}
+        self._pending = queue.SimpleQueue()
+        self._socket = None
+        self._thread = None
+
+    def register(self, target, handler):
+        self._handlers[target] = handler
+
+    def register_node(self, node):
+        self.register(node.name, node.reconfigure)
+
+    def start(self):
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self._socket_path)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            message = self._socket.recv(MAX_MESSAGE_SIZE)
+            try:
+                self.handle(message)
+            except Exception:
+                log.exception("Failed to handle control message %r", message)
+
+    def handle(self, message):
+        request = json.loads(message)
+        handler = self._handlers[request["target"]]
+        self._pending.put(handler(**request.get("params", {})))
+
+    def apply_pending(self):
+        while True:
+            try:
+                commit = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            commit()
+
+
+def send(socket_path, target, **params):
+    message = json.dumps({"target": target, "params": params}).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.sendto(message, socket_path)
+
+
+def main() -> None:
+    socket_path, target, *assignments = sys.argv[1:]
+    params = {}
+    for assignment in assignments:
+        key, value = assignment.split("=", 1)
+        params[key] = json.loads(value)
+    send(socket_path, target, **params)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,42 @@ from pyPiper import Node
 from audioviz import a_weighting_table
 
 
+_UNCHANGED = object()
+
+MAX_TIME_DELTA = 1
+
+def _to_float(name, value, minimum=-math.inf, exclusive=False, maximum=math.inf):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number, got {value!r}") from None
+    if not math.isfinite(number) or number < minimum or (exclusive and number == minimum):
+        bound = ">" if exclusive else ">="
+        raise ValueError(f"{name} must be finite and {bound} {minimum}, got {value!r}")
+    if number > maximum:
+        raise ValueError(f"{name} must be <= {maximum}, got {value!r}")
+    return number
+
+
+def _to_rates(name, value, bands):
+    try:
+        rates = np.asarray(value, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number or a list of numbers, got {value!r}") from None
+    if rates.shape not in ((), (bands,)):
+        raise ValueError(f"{name} must be a number or {bands} numbers, got {value!r}")
+    if not np.all(np.isfinite(rates)) or np.any(rates < 1):
+        raise ValueError(f"{name} must be finite and >= 1, got {value!r}")
+    return rates if rates.ndim else float(rates)
+
+
+def _to_int(name, value, minimum=-math.inf, maximum=math.inf):
+    number = _to_float(name, value, minimum, maximum=maximum)
+    if not number.is_integer():
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    return int(number)
+
+
 class ContiniuousVolumeNormalizer:
     def __init__(self, min_threshold=0, falloff=1.1) -> None:
         self._min_threshold = min_threshold
@@ -17,6 +53,12 @@ class ContiniuousVolumeNormalizer:
         self._current_threshold = self._min_threshold
         self._last_call = 0
 
+    def set_parameters(self, min_threshold=None, falloff=None):
+        if min_threshold is not None:
+            self._min_threshold = min_threshold
+        if falloff is not None:
+            self._falloff = falloff
+
     def _update_threshold(self, max_sample, timestamp):
         if max_sample >= self._current_threshold:
             self._current_threshold = max_sample
@@ -41,6 +83,105 @@ class ContiniuousVolumeNormalizer:
         return np.zeros_like(signal)
 
 
+class BandVolumeNormalizer:
+    """Per band counterpart to ContiniuousVolumeNormalizer.
+
+    Every band follows its own threshold. When a band gets louder than its
+    threshold the threshold rises with ``attack`` (instantly if ``attack`` is
+    None), otherwise it falls towards the band's level with ``falloff``. Both
+    rates may be scalars or arrays with one value per band. All state lives in
+    arrays allocated up front and is updated without per band branching.
+
+    With a single band and instant attack this behaves like
+    ContiniuousVolumeNormalizer fed with the peak of the signal.
+    """
+
+    def __init__(self, bands, min_threshold=0, falloff=1.1, attack=None) -> None:
+        self._min_threshold = min_threshold
+        # Rates are kept as floats: numpy refuses negative powers of integers.
+        self._falloff = np.asarray(falloff, dtype=float)
+        self._attack = None if attack is None else np.asarray(attack, dtype=float)
+        self._threshold = np.full(bands, min_threshold, dtype=float)
+        self._magnitude = np.empty(bands)
+        self._decay_factor = np.empty(bands)
+        self._attack_factor = np.zeros(bands)
+        self._factor = np.empty(bands)
+        self._rising = np.empty(bands, dtype=bool)
+        self._nonzero = np.empty(bands, dtype=bool)
+        self._valid = np.empty(bands, dtype=bool)
+        self._last_call = 0
+
+    def set_parameters(self, min_threshold=None, falloff=None, attack=_UNCHANGED):
+        if min_threshold is not None:
+            self._min_threshold = min_threshold
+        if falloff is not None:
+            self._falloff = np.asarray(falloff, dtype=float)
+        if attack is not _UNCHANGED:
+            self._attack = None if attack is None else np.asarray(attack, dtype=float)
+            if attack is None:
+                self._attack_factor[...] = 0
+
+    def _update_threshold(self, magnitude, decay_factor, attack_factor):
+        np.greater_equal(magnitude, self._threshold, out=self._rising)
+        np.copyto(self._factor, decay_factor)
+        np.copyto(self._factor, attack_factor, where=self._rising)
+        np.subtract(self._threshold, magnitude, out=self._threshold)
+        np.multiply(self._threshold, self._factor, out=self._threshold)
+        np.add(self._threshold, magnitude, out=self._threshold)
+
+    def _apply_threshold(self, signal, out):
+        np.greater_equal(self._threshold, self._min_threshold, out=self._valid)
+        np.not_equal(self._threshold, 0, out=self._nonzero)
+        np.logical_and(self._valid, self._nonzero, out=self._valid)
+        out[...] = 0
+        np.divide(signal, self._threshold, out=out, where=self._valid)
+        return out
+
+    def normalize(self, signal, timestamp):
+        if self._last_call == 0:
+            self._last_call = timestamp
+        time_delta = timestamp - self._last_call
+        self._last_call = timestamp
+        np.abs(signal, out=self._magnitude)
+        np.power(self._falloff, -time_delta, out=self._decay_factor)
+        if self._attack is not None:
+            np.power(self._attack, -time_delta, out=self._attack_factor)
+        self._update_threshold(self._magnitude, self._decay_factor, self._attack_factor)
+        return self._apply_threshold(signal, np.empty_like(self._threshold))
+
+    def scan(self, signals, timestamps):
+        """Normalize a batch of frames at once.
+
+        The result is identical to calling ``normalize`` once per frame in
+        order, and the state is left as if that had happened.
+        """
+        signals = np.asarray(signals, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        if len(signals) == 0:
+            return np.empty_like(signals)
+        if self._last_call == 0:
+            self._last_call = timestamps[0]
+        time_deltas = np.diff(timestamps, prepend=self._last_call)[:, np.newaxis]
+        self._last_call = timestamps[-1]
+
+        magnitudes = np.abs(signals)
+        decay_factors = np.broadcast_to(
+            np.power(self._falloff, -time_deltas), signals.shape
+        )
+        if self._attack is None:
+            attack_factors = np.zeros(signals.shape)
+        else:
+            attack_factors = np.broadcast_to(
+                np.power(self._attack, -time_deltas), signals.shape
+            )
+
+        normalized = np.empty_like(signals)
+        for i in range(len(signals)):
+            self._update_threshold(magnitudes[i], decay_factors[i], attack_factors[i])
+            self._apply_threshold(signals[i], normalized[i])
+        return normalized
+
+
 class PlottableNode(Node):
     def setup(self, monitor_client=None):
         self.monitor_client = monitor_client
@@ -54,18 +195,44 @@ class PlottableNode(Node):
         self.plot(data)
         return super().emit(data)
 
+    def reconfigure(self, **params):
+        raise TypeError(f"{type(self).__name__} has no runtime parameters")
+
 
 class AudioGenerator(PlottableNode):
-    def setup(self, audio_input, samples, monitor_client=None, time_delta=1/60):
+    def setup(
+        self, audio_input, samples, monitor_client=None, time_delta=1/60, control_server=None
+    ):
         super().setup(monitor_client)
         self._samples = samples
         self._input_device = audio_input
         self._time_delta = time_delta
         self._last_time = 0
+        self._control_server = control_server
+
+    def reconfigure(self, time_delta):
+        time_delta = _to_float("time_delta", time_delta, minimum=0, maximum=MAX_TIME_DELTA)
+
+        def commit():
+            self._time_delta = time_delta
+
+        return commit
+
+    def prepare_window(self, samples):
+        # Not exposed through reconfigure: the window size has to change
+        # together with every node downstream that depends on it.
+        samples = _to_int("samples", samples, minimum=1)
+
+        def commit():
+            self._samples = samples
+
+        return commit
 
     def run(self, data):
         wait = max(0, self._time_delta - (time.time() - self._last_time))
         time.sleep(wait)
+        if self._control_server is not None:
+            self._control_server.apply_pending()
         samples = np.array(self._input_device.get_window(self._samples))
         self.emit(samples)
         self._last_time = time.time()
@@ -76,6 +243,14 @@ class Hamming(PlottableNode):
         super().setup(monitor_client)
         self._window = np.hamming(samples)
 
+    def reconfigure(self, samples):
+        window = np.hamming(_to_int("samples", samples, minimum=1))
+
+        def commit():
+            self._window = window
+
+        return commit
+
     def run(self, data):
         self.emit(np.multiply(data, self._window))
 
@@ -83,9 +258,28 @@ class Hamming(PlottableNode):
 class FastFourierTransform(PlottableNode):
     def setup(self, samples, sample_delta, monitor_client=None):
         super().setup(monitor_client)
+        self._config = {"samples": samples, "sample_delta": sample_delta}
         self.sample_delta = sample_delta
         self.fourier_frequencies = rfftfreq(samples, d=sample_delta)
 
+    def reconfigure(self, samples=None, sample_delta=None):
+        config = dict(self._config)
+        if samples is not None:
+            config["samples"] = _to_int("samples", samples, minimum=1)
+        if sample_delta is not None:
+            config["sample_delta"] = _to_float(
+                "sample_delta", sample_delta, minimum=0, exclusive=True
+            )
+        sample_delta = config["sample_delta"]
+        fourier_frequencies = rfftfreq(config["samples"], d=sample_delta)
+        self._config = config
+
+        def commit():
+            self.sample_delta = sample_delta
+            self.fourier_frequencies = fourier_frequencies
+
+        return commit
+
     def run(self, data):
         self.emit(np.absolute(fourier_transform(data) * self.sample_delta))
 
@@ -95,14 +289,51 @@ class OctaveSubsampler(PlottableNode):
         self, start_octave, samples_per_octave, num_octaves, frequencies, monitor_client=None
     ):
         super().setup(monitor_client)
-        self._sample_points = np.exp2(
+        self._config = {
+            "start_octave": start_octave,
+            "samples_per_octave": samples_per_octave,
+            "num_octaves": num_octaves,
+            "frequencies": frequencies,
+        }
+        self._sample_points = self._compute_sample_points(
+            start_octave, samples_per_octave, num_octaves
+        )
+        self.frequencies = frequencies
+
+    @staticmethod
+    def _compute_sample_points(start_octave, samples_per_octave, num_octaves):
+        return np.exp2(
             (
                 np.arange(samples_per_octave * num_octaves)
                 + samples_per_octave * start_octave
             )
             / samples_per_octave
         )
-        self.frequencies = frequencies
+
+    def reconfigure(self, start_octave):
+        # samples_per_octave and num_octaves change the output length, which
+        # the rest of the pipeline treats as fixed, so they stay setup only.
+        config = dict(self._config)
+        config["start_octave"] = _to_float("start_octave", start_octave)
+        return self._prepare(config)
+
+    def prepare_frequencies(self, frequencies):
+        config = dict(self._config)
+        config["frequencies"] = frequencies
+        return self._prepare(config)
+
+    def _prepare(self, config):
+        sample_points = self._compute_sample_points(
+            config["start_octave"], config["samples_per_octave"], config["num_octaves"]
+        )
+        frequencies = config["frequencies"]
+        self._config = config
+
+        def commit():
+            self._sample_points = sample_points
+            self.frequencies = frequencies
+
+        return commit
 
     def run(self, data):
         self.emit(
@@ -114,12 +345,54 @@ class ExponentialSubsampler(PlottableNode):
         self, start_frequency, stop_frequency, samples, frequencies, monitor_client=None
     ):
         super().setup(monitor_client)
+        self._config = {
+            "start_frequency": start_frequency,
+            "stop_frequency": stop_frequency,
+            "samples": samples,
+            "frequencies": frequencies,
+        }
+        self._sample_points = self._compute_sample_points(
+            start_frequency, stop_frequency, samples
+        )
+        self.frequencies = frequencies
+
+    @staticmethod
+    def _compute_sample_points(start_frequency, stop_frequency, samples):
         start_note = np.log2(start_frequency)
         stop_note = np.log2(stop_frequency)
-        self._sample_points = np.exp2(
-            np.linspace(start_note, stop_note, samples)
+        return np.exp2(np.linspace(start_note, stop_note, samples))
+
+    def reconfigure(self, start_frequency=None, stop_frequency=None):
+        # samples changes the output length, which the rest of the pipeline
+        # treats as fixed, so it stays setup only.
+        config = dict(self._config)
+        if start_frequency is not None:
+            config["start_frequency"] = _to_float(
+                "start_frequency", start_frequency, minimum=0, exclusive=True
+            )
+        if stop_frequency is not None:
+            config["stop_frequency"] = _to_float(
+                "stop_frequency", stop_frequency, minimum=0, exclusive=True
+            )
+        return self._prepare(config)
+
+    def prepare_frequencies(self, frequencies):
+        config = dict(self._config)
+        config["frequencies"] = frequencies
+        return self._prepare(config)
+
+    def _prepare(self, config):
+        sample_points = self._compute_sample_points(
+            config["start_frequency"], config["stop_frequency"], config["samples"]
         )
-        self.frequencies = frequencies
+        frequencies = config["frequencies"]
+        self._config = config
+
+        def commit():
+            self._sample_points = sample_points
+            self.frequencies = frequencies
+
+        return commit
 
     def run(self, data):
         self.emit(
@@ -129,10 +402,22 @@ class ExponentialSubsampler(PlottableNode):
 
 class AWeighting(PlottableNode):
     def setup(self, frequencies, monitor_client=None):
-        self.weights = np.interp(
+        self.weights = self._compute_weights(frequencies)
+        super().setup(monitor_client)
+
+    @staticmethod
+    def _compute_weights(frequencies):
+        return np.interp(
             frequencies, a_weighting_table.frequencies, a_weighting_table.weights
         )
-        super().setup(monitor_client)
+
+    def reconfigure(self, frequencies):
+        weights = self._compute_weights(frequencies)
+
+        def commit():
+            self.weights = weights
+
+        return commit
 
     def run(self, data):
         self.emit(data * self.weights)
@@ -179,6 +464,14 @@ class Roll(PlottableNode):
         super().setup(monitor_client=monitor_client)
         self._shift = shift
 
+    def reconfigure(self, shift):
+        shift = _to_int("shift", shift)
+
+        def commit():
+            self._shift = shift
+
+        return commit
+
     def run(self, data):
         self.emit(np.roll(data, self._shift))
 
@@ -189,6 +482,16 @@ class Logarithm(PlottableNode):
         self.i_0 = i_0
         self.at_1 = np.log(1 / self.i_0 + 1)
 
+    def reconfigure(self, i_0):
+        i_0 = _to_float("i_0", i_0, minimum=0, exclusive=True)
+        at_1 = np.log(1 / i_0 + 1)
+
+        def commit():
+            self.i_0 = i_0
+            self.at_1 = at_1
+
+        return commit
+
     def run(self, data):
         self.emit((np.log(data / self.i_0 + 1) / self.at_1))
 
@@ -200,6 +503,45 @@ class Normalizer(PlottableNode):
             min_threshold=min_threshold, falloff=falloff
         )
 
+    def reconfigure(self, min_threshold=None, falloff=None):
+        if min_threshold is not None:
+            min_threshold = _to_float("min_threshold", min_threshold, minimum=0)
+        if falloff is not None:
+            falloff = _to_float("falloff", falloff, minimum=1)
+
+        def commit():
+            self.normalizer.set_parameters(min_threshold=min_threshold, falloff=falloff)
+
+        return commit
+
+    def run(self, data):
+        self.emit(self.normalizer.normalize(data, time.time()))
+
+
+class BandNormalizer(PlottableNode):
+    def setup(self, bands, min_threshold=0, falloff=1.1, attack=None, monitor_client=None):
+        super().setup(monitor_client=monitor_client)
+        self._bands = bands
+        self.normalizer = BandVolumeNormalizer(
+            bands, min_threshold=min_threshold, falloff=falloff, attack=attack
+        )
+
+    def reconfigure(self, min_threshold=None, falloff=None, attack=_UNCHANGED):
+        # attack=None switches back to instant attack.
+        if min_threshold is not None:
+            min_threshold = _to_float("min_threshold", min_threshold, minimum=0)
+        if falloff is not None:
+            falloff = _to_rates("falloff", falloff, self._bands)
+        if attack is not _UNCHANGED and attack is not None:
+            attack = _to_rates("attack", attack, self._bands)
+
+        def commit():
+            self.normalizer.set_parameters(
+                min_threshold=min_threshold, falloff=falloff, attack=attack
+            )
+
+        return commit
+
     def run(self, data):
         self.emit(self.normalizer.normalize(data, time.time()))
 
@@ -211,6 +553,14 @@ class Fade(PlottableNode):
         self.last_data = None
         self.last_update = None
 
+    def reconfigure(self, falloff):
+        falloff = _to_float("falloff", falloff, minimum=1)
+
+        def commit():
+            self._falloff = falloff
+
+        return commit
+
     def run(self, data):
         now = time.time()
         if self.last_data is None:
@@ -230,17 +580,28 @@ class Shift(Node):
         self.minimum = minimum
         self.factor = maximum - minimum
 
+    def reconfigure(self, minimum=None, maximum=None):
+        if minimum is not None:
+            minimum = _to_float("minimum", minimum)
+        if maximum is not None:
+            maximum = _to_float("maximum", maximum)
+
+        def commit():
+            new_minimum = self.minimum if minimum is None else minimum
+            new_maximum = self.minimum + self.factor if maximum is None else maximum
+            self.minimum = new_minimum
+            self.factor = new_maximum - new_minimum
+
+        return commit
+
     def run(self, data):
         self.emit(data * self.factor + self.minimum)
 
 
 class Star(Node):
     def setup(self, ip_address, port, led_per_beam, beams, octaves):
-        self.led_per_beam = led_per_beam
         self.beams = beams
         self.client = air_client.AirClient(ip_address, int(port), air_client.ColorMethodGRB)
-        self._resolution = led_per_beam * 16
-        self._pre_computed_strips = self._pre_compute_strips(self._resolution)
         self._octaves = octaves
         # self._colors = np.array(
         #     [
@@ -248,29 +609,54 @@ class Star(Node):
         #         for b in np.linspace(0, 1, num=self._octaves * beams)
         #     ]
         # ).reshape((self._octaves, beams * led_per_beam, 3))
-        self._colors = np.transpose(np.array([np.array([0, 1, 1])] * led_per_beam * beams))
+        self._max_led_per_beam = led_per_beam
+        self.reconfigure(led_per_beam=led_per_beam)()
 
-        self._index_mask = np.zeros(beams, dtype="int")
-        self._index_mask[1::2] = self._resolution
+    def reconfigure(self, led_per_beam):
+        # The strips can be driven shorter than they are, never longer.
+        led_per_beam = _to_int(
+            "led_per_beam", led_per_beam, minimum=1, maximum=self._max_led_per_beam
+        )
+        resolution = led_per_beam * 16
+        pre_computed_strips = self._pre_compute_strips(resolution, led_per_beam)
+        colors = np.transpose(np.array([np.array([0, 1, 1])] * led_per_beam * self.beams))
+
+        index_mask = np.zeros(self.beams, dtype="int")
+        index_mask[1::2] = resolution
 
-        self._blank_frame = np.zeros(beams * led_per_beam * 3).reshape(
-            (beams * led_per_beam, 3)
+        blank_frame = np.zeros(self.beams * led_per_beam * 3).reshape(
+            (self.beams * led_per_beam, 3)
         )
 
-    def _make_strip(self, value):
-        scaled_value = value * self.led_per_beam
+        def commit():
+            self.led_per_beam = led_per_beam
+            self._resolution = resolution
+            self._pre_computed_strips = pre_computed_strips
+            self._colors = colors
+            self._index_mask = index_mask
+            self._blank_frame = blank_frame
+
+        return commit
+
+    @staticmethod
+    def _make_strip(value, led_per_beam):
+        scaled_value = value * led_per_beam
         return np.array(
             [0.3 for i in range(math.floor(scaled_value))]
             + [0.3 * (scaled_value - math.floor(scaled_value))]
-            + [0 for _ in range(self.led_per_beam - math.floor(scaled_value) - 1)]
+            + [0 for _ in range(led_per_beam - math.floor(scaled_value) - 1)]
         )
 
-    def _make_reverse_strip(self, value):
-        return np.flip(self._make_strip(value), axis=0)
+    @classmethod
+    def _make_reverse_strip(cls, value, led_per_beam):
+        return np.flip(cls._make_strip(value, led_per_beam), axis=0)
 
-    def _pre_compute_strips(self, resolution):
-        strips = [self._make_strip(i / resolution) for i in range(resolution)]
-        reverse = [self._make_reverse_strip(i / resolution) for i in range(resolution)]
+    @classmethod
+    def _pre_compute_strips(cls, resolution, led_per_beam):
+        strips = [cls._make_strip(i / resolution, led_per_beam) for i in range(resolution)]
+        reverse = [
+            cls._make_reverse_strip(i / resolution, led_per_beam) for i in range(resolution)
+        ]
         return np.array(strips + reverse)
 
     def _values_to_rgb(self, values, timestamp):
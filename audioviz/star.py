@@ -3,14 +3,18 @@ import sys
 import os
 
 from airpixel import client as air_client
+from numpy.fft import rfftfreq
 from pyPiper import Pipeline
 
 import mupa_client
-from audioviz import nodes
+
+from audioviz import control, nodes
 
 
 BEAMS = 36
 LED_PER_BEAM = 8
+# The spectrum is mirrored onto the beams, so it only needs half as many bands.
+BANDS = BEAMS // 2
 
 VISUALIZE = bool(os.environ.get("VISUALIZE", False))
 
@@ -18,6 +22,8 @@ SAMPLE_RATE = 22050
 
 PORT = 50000
 
+CONTROL_SOCKET = "control_uds"
+
 VOLUME_MIN_THRESHOLD = 0
 VOLUME_FALLOFF = 1.1
 VOLUME_DEBUG = 0
@@ -28,62 +34,109 @@ FIRST_OCTAVE = 8
 NUM_OCTAVES = 6
 
 WINDOW_SIZE_SEC = 0.05
+MAX_WINDOW_SIZE_SEC = 0.5
 
 
 def main() -> None:
     ip_address, port = sys.argv[1:3]
 
     mon_client = air_client.MonitorClient("monitoring_uds")
+    control_server = control.ControlServer(CONTROL_SOCKET)
 
     audio_input = mupa_client.Client()
     audio_input.connect()
 
-    samples = int(audio_input.get_sample_rate() * WINDOW_SIZE_SEC)
+    sample_rate = audio_input.get_sample_rate()
+    samples = int(sample_rate * WINDOW_SIZE_SEC)
+    mic = nodes.AudioGenerator(
+        "mic",
+        audio_input=audio_input,
+        samples=samples,
+        monitor_client=mon_client,
+        control_server=control_server,
+    )
+    hamming = nodes.Hamming("hamming", samples=samples, monitor_client=mon_client)
     fft_node = nodes.FastFourierTransform(
-        "fft", samples=samples, sample_delta=1/audio_input.get_sample_rate(), monitor_client=mon_client
+        "fft", samples=samples, sample_delta=1/sample_rate, monitor_client=mon_client
+    )
+    a_weighting = nodes.AWeighting(
+        "a-weighting", frequencies=fft_node.fourier_frequencies, monitor_client=mon_client
+    )
+    # sampled = nodes.OctaveSubsampler(
+    #     "sampled",
+    #     start_octave=FIRST_OCTAVE,
+    #     samples_per_octave=BEAMS / NUM_OCTAVES,
+    #     num_octaves=NUM_OCTAVES,
+    #     frequencies=fft_node.fourier_frequencies,
+    #     monitor_client=mon_client,
+    # )
+    sampled = nodes.ExponentialSubsampler("sampled", start_frequency=65, stop_frequency=1046, samples=BANDS, frequencies=fft_node.fourier_frequencies, monitor_client=mon_client)
+    # folded = nodes.FoldingNode("folded", samples_per_octave=BEAMS, monitor_client=mon_client)
+    # summed = nodes.SumMatrixVertical("sum", monitor_client=mon_client)
+    # maxed = nodes.MaxMatrixVertical("max", monitor_client=mon_client)
+    normalized = nodes.Normalizer(
+        "normalized",
+        min_threshold=VOLUME_MIN_THRESHOLD,
+        falloff=VOLUME_FALLOFF,
+        monitor_client=mon_client,
+    )
+    # normalized = nodes.BandNormalizer(
+    #     "normalized",
+    #     bands=BANDS,
+    #     min_threshold=VOLUME_MIN_THRESHOLD,
+    #     falloff=VOLUME_FALLOFF,
+    #     monitor_client=mon_client,
+    # )
+    square = nodes.Square("square", monitor_client=mon_client)
+    # log = nodes.Logarithm("log", i_0=0.03, monitor_client=mon_client)
+    # fade = nodes.Fade("fade", falloff=FADE_FALLOFF, monitor_client=mon_client)
+    # clip = nodes.Shift("clip", minimum=0.14)
+    mirrored = nodes.Mirror("mirrored", reverse=False, monitor_client=mon_client)
+    rolled = nodes.Roll("rolled", shift=16, monitor_client=mon_client)
+    ring = nodes.Star(
+        "ring",
+        ip_address=ip_address,
+        port=port,
+        led_per_beam=LED_PER_BEAM,
+        beams=BEAMS,
+        octaves=NUM_OCTAVES,
     )
 
-    pipeline = Pipeline(
-        nodes.AudioGenerator(
-            "mic", audio_input=audio_input, samples=samples, monitor_client=mon_client
+    def set_window_size(window_size_sec):
+        window_size_sec = float(window_size_sec)
+        if not 0 < window_size_sec <= MAX_WINDOW_SIZE_SEC:
+            raise ValueError(
+                f"window_size_sec must be in (0, {MAX_WINDOW_SIZE_SEC}], got {window_size_sec}"
+            )
+        new_samples = int(sample_rate * window_size_sec)
+        # The mic rejects invalid sample counts before any other node has
+        # recorded the new window size.
+        mic_commit = mic.prepare_window(new_samples)
+        frequencies = rfftfreq(new_samples, d=1/sample_rate)
+        return control.chain(
+            mic_commit,
+            hamming.reconfigure(samples=new_samples),
+            fft_node.reconfigure(samples=new_samples),
+            a_weighting.reconfigure(frequencies=frequencies),
+            sampled.prepare_frequencies(frequencies),
         )
-        | nodes.Hamming("hamming", samples=samples, monitor_client=mon_client)
+
+    control_server.register("window", set_window_size)
+    for node in (mic, sampled, normalized, rolled, ring):
+        control_server.register_node(node)
+    control_server.start()
+
+    pipeline = Pipeline(
+        mic
+        | hamming
         | fft_node
-        | nodes.AWeighting(
-            "a-weighting", frequencies=fft_node.fourier_frequencies, monitor_client=mon_client
-        )
-        # | nodes.OctaveSubsampler(
-        #     "sampled",
-        #     start_octave=FIRST_OCTAVE,
-        #     samples_per_octave=BEAMS / NUM_OCTAVES,
-        #     num_octaves=NUM_OCTAVES,
-        #     frequencies=fft_node.fourier_frequencies,
-        #     monitor_client=mon_client,
-        # )
-        | nodes.ExponentialSubsampler("sampled", start_frequency=65, stop_frequency=1046, samples=18, frequencies=fft_node.fourier_frequencies, monitor_client=mon_client)
-        # | nodes.FoldingNode("folded", samples_per_octave=BEAMS, monitor_client=mon_client)
-        # | nodes.SumMatrixVertical("sum", monitor_client=mon_client)
-        # | nodes.MaxMatrixVertical("max", monitor_client=mon_client)
-        | nodes.Normalizer(
-            "normalized",
-            min_threshold=VOLUME_MIN_THRESHOLD,
-            falloff=VOLUME_FALLOFF,
-            monitor_client=mon_client,
-        )
-        | nodes.Square("square", monitor_client=mon_client)
-        # | nodes.Logarithm("log", i_0=0.03, monitor_client=mon_client)
-        # | nodes.Fade("fade", falloff=FADE_FALLOFF, monitor_client=mon_client)
-        # | nodes.Shift("clip", minimum=0.14)
-        | nodes.Mirror("mirrored", reverse=False, monitor_client=mon_client)
-        | nodes.Roll("rolled", shift=16, monitor_client=mon_client)
-        | nodes.Star(
-            "ring",
-            ip_address=ip_address,
-            port=port,
-            led_per_beam=LED_PER_BEAM,
-            beams=BEAMS,
-            octaves=NUM_OCTAVES,
-        )
+        | a_weighting
+        | sampled
+        | normalized
+        | square
+        | mirrored
+        | rolled
+        | ring
     )
 
     pipeline.run()
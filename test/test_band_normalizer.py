@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from audioviz import nodes
+
+
+FRAMES = 200
+BANDS = 18
+
+
+@pytest.fixture
+def signals():
+    rng = np.random.default_rng(0)
+    return rng.random((FRAMES, BANDS)) * np.linspace(3, 0.1, BANDS)
+
+
+@pytest.fixture
+def timestamps():
+    rng = np.random.default_rng(1)
+    return 1000 + np.cumsum(rng.random(FRAMES) * 0.03)
+
+
+@pytest.mark.parametrize("attack", [None, 50.0])
+@pytest.mark.parametrize("falloff", [1.1, np.linspace(1.05, 2, BANDS)])
+def test_scan_matches_sequential_normalize(signals, timestamps, attack, falloff):
+    sequential = nodes.BandVolumeNormalizer(
+        BANDS, min_threshold=0.5, falloff=falloff, attack=attack
+    )
+    batched = nodes.BandVolumeNormalizer(
+        BANDS, min_threshold=0.5, falloff=falloff, attack=attack
+    )
+
+    expected = np.array(
+        [sequential.normalize(s, t) for s, t in zip(signals, timestamps)]
+    )
+    half = FRAMES // 2
+    actual = np.concatenate(
+        [
+            batched.scan(signals[:half], timestamps[:half]),
+            batched.scan(signals[half:], timestamps[half:]),
+        ]
+    )
+
+    np.testing.assert_array_equal(actual, expected)
+    np.testing.assert_array_equal(batched._threshold, sequential._threshold)
+
+
+def test_scan_of_no_frames(signals, timestamps):
+    normalizer = nodes.BandVolumeNormalizer(BANDS)
+
+    assert normalizer.scan(signals[:0], timestamps[:0]).shape == (0, BANDS)
+
+
+def test_single_band_matches_continuous_normalizer(signals, timestamps):
+    peaks = signals.max(axis=1)
+    continuous = nodes.ContiniuousVolumeNormalizer(min_threshold=0.5, falloff=1.3)
+    band = nodes.BandVolumeNormalizer(1, min_threshold=0.5, falloff=1.3)
+
+    for peak, timestamp in zip(peaks, timestamps):
+        expected = continuous.normalize(np.array([peak]), timestamp)
+        actual = band.normalize(np.array([peak]), timestamp)
+        np.testing.assert_allclose(actual, expected)
+
+
+def test_attack_can_be_reset_to_instant(signals, timestamps):
+    node = nodes.BandNormalizer("normalized", bands=BANDS, attack=50.0)
+
+    node.reconfigure(attack=None)()
+
+    instant = nodes.BandVolumeNormalizer(BANDS)
+    np.testing.assert_array_equal(
+        node.normalizer.scan(signals, timestamps), instant.scan(signals, timestamps)
+    )
+
+
+def test_loud_band_does_not_pin_quiet_band():
+    normalizer = nodes.BandVolumeNormalizer(2, falloff=1.1)
+    signal = np.array([10.0, 0.01])
+
+    for timestamp in 1000 + np.arange(10) * 0.02:
+        normalized = normalizer.normalize(signal, timestamp)
+
+    np.testing.assert_allclose(normalized, [1, 1])
+
+
+def test_finite_attack_rises_gradually():
+    normalizer = nodes.BandVolumeNormalizer(1, attack=2.0)
+    signal = np.array([1.0])
+
+    normalizer.normalize(signal, 1000.0)
+    normalized = normalizer.normalize(signal, 1001.0)
+
+    assert normalizer._threshold[0] == pytest.approx(0.5)
+    assert normalized[0] == pytest.approx(2)
+
+    normalizer.normalize(signal, 1002.0)
+
+    assert normalizer._threshold[0] == pytest.approx(0.75)
+
+
+def test_integer_rates_and_timestamps():
+    integers = nodes.BandVolumeNormalizer(3, falloff=2, attack=4)
+    floats = nodes.BandVolumeNormalizer(3, falloff=2.0, attack=4.0)
+    signal = np.array([3.0, 2.0, 1.0])
+
+    for timestamp, quieter in [(1, 1), (2, 2), (3, 4)]:
+        np.testing.assert_array_equal(
+            integers.normalize(signal / quieter, timestamp),
+            floats.normalize(signal / quieter, float(timestamp)),
+        )
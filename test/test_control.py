@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from numpy.fft import rfftfreq
+
+from audioviz import control, nodes
+
+
+SAMPLE_RATE = 22050
+
+
+def _message(target, **params):
+    return json.dumps({"target": target, "params": params}).encode()
+
+
+@pytest.fixture
+def fft_node():
+    return nodes.FastFourierTransform("fft", samples=1102, sample_delta=1 / SAMPLE_RATE)
+
+
+@pytest.fixture
+def sampled(fft_node):
+    return nodes.ExponentialSubsampler(
+        "sampled",
+        start_frequency=65,
+        stop_frequency=1046,
+        samples=18,
+        frequencies=fft_node.fourier_frequencies,
+    )
+
+
+@pytest.fixture
+def server(fft_node, sampled):
+    server = control.ControlServer("unused")
+
+    def set_window_size(window_size_sec):
+        samples = int(SAMPLE_RATE * window_size_sec)
+        return control.chain(
+            fft_node.reconfigure(samples=samples),
+            sampled.prepare_frequencies(rfftfreq(samples, d=1 / SAMPLE_RATE)),
+        )
+
+    server.register("window", set_window_size)
+    server.register_node(sampled)
+    server.register_node(nodes.AudioGenerator("mic", audio_input=None, samples=1102))
+    server.register_node(
+        nodes.Star(
+            "ring", ip_address="127.0.0.1", port=50000, led_per_beam=8, beams=36, octaves=6
+        )
+    )
+    server.register_node(nodes.Normalizer("normalized"))
+    return server
+
+
+def test_queued_updates_build_on_each_other(server, fft_node, sampled):
+    server.handle(_message("window", window_size_sec=0.08))
+    server.handle(_message("sampled", start_frequency=55))
+
+    server.apply_pending()
+
+    assert len(sampled.frequencies) == len(fft_node.fourier_frequencies)
+    assert sampled._sample_points[0] == pytest.approx(55)
+
+
+@pytest.mark.parametrize(
+    "target, params",
+    [
+        ("normalized", {"falloff": [1.1, 1.2]}),
+        ("normalized", {"falloff": "fast"}),
+        ("normalized", {"min_threshold": -1}),
+        ("sampled", {"samples": 24}),
+        ("sampled", {"frequencies": [1, 2, 3]}),
+        ("mic", {"samples": 2000}),
+        ("mic", {"time_delta": 1e9}),
+        ("ring", {"led_per_beam": 0}),
+        ("ring", {"led_per_beam": 10**9}),
+    ],
+)
+def test_invalid_parameters_are_not_queued(server, target, params):
+    with pytest.raises((TypeError, ValueError)):
+        server.handle(_message(target, **params))
+
+    assert server._pending.empty()